@@ -4,17 +4,26 @@
 #which is based on 'export-sprites.py' and 'glsprite.py' from TCHOW Rainbow; code used is released into the public domain.
 
 #Note: Script meant to be executed within blender 3.3, as per:
-#blender --background --python export-blocks.py -- blocks.blend blocks.json [instructions.json]
+#blender --background --python export-blocks.py -- blocks.blend blocks.json [instructions.json] [precompute[:tolerance]]
 
-import sys,re
+import sys,re,math
 
 args = []
 for i in range(0,len(sys.argv)):
 	if sys.argv[i] == '--':
 		args = sys.argv[i+1:]
 
+#precompute derived data (face centers/normals, yarn polylines) so the UI can skip it at load time:
+PRECOMPUTE = False
+TOLERANCE = 0.005 #maximum distance between yarn polyline and bezier curve
+if len(args) > 0 and (args[-1] == "precompute" or args[-1].startswith("precompute:")):
+	PRECOMPUTE = True
+	if args[-1].startswith("precompute:"):
+		TOLERANCE = float(args[-1][len("precompute:"):])
+	args = args[:-1]
+
 if len(args) not in [2, 3]:
-	print("\n\nUsage:\nblender --background --python export-blocks.py -- <infile.blend> <outfile.json> [instructions.json]\nExports all blocks (meshes in the \"Blocks\" collection) to a block library json file. Optionally reads machine an human instructions for the blocks from a separate json file\n")
+	print("\n\nUsage:\nblender --background --python export-blocks.py -- <infile.blend> <outfile.json> [instructions.json] [precompute[:tolerance]]\nExports all blocks (meshes in the \"Blocks\" collection) to a block library json file. Optionally reads machine an human instructions for the blocks from a separate json file. With 'precompute', also writes face centers/normals and yarn polylines (within tolerance, default 0.005) and marks blocks as validated.\n")
 	exit(1)
 
 import json
@@ -48,6 +57,19 @@ TYPE_COLORS={
 	"x":"#444444",
 }
 
+#flatten a cubic bezier segment into uniformly spaced points (excluding p0); the number of steps is chosen so that
+#the chord error (<= |B''| / (8 n^2), with |B''| <= 6 max |second difference|) stays below tolerance,
+#which is the same bound export-yarn-path.py uses:
+def flatten_bezier(p0, p1, p2, p3, tolerance, pts):
+	second = max((p0 - 2 * p1 + p2).length, (p1 - 2 * p2 + p3).length)
+	steps = max(1, math.ceil(math.sqrt(0.75 * second / tolerance)))
+	for i in range(1, steps + 1):
+		t = i / steps
+		pts.append((1-t)**3 * p0 + 3*(1-t)**2*t * p1 + 3*(1-t)*t**2 * p2 + t**3 * p3)
+
+def format_vec3(v, digits):
+	return f'[{v.x:.{digits}f},{v.y:.{digits}f},{v.z:.{digits}f}]'
+
 out = []
 
 for obj in blocks.objects:
@@ -330,7 +352,19 @@ for obj in blocks.objects:
 		face = faces[i]
 		comma = ','
 		if i is face_order[-1]: comma = ''
-		out.append(f'\t\t{{ "type":"{face["type"]}", "direction":{face["direction"]}, "indices":[{",".join(map(str, face["indices"]))}], "color":"{TYPE_COLORS[face["type"]]}" }}{comma}')
+		derived = ''
+		if PRECOMPUTE:
+			#same center + normal computation as the Template constructor in code/sv.mjs:
+			corners = [mesh.vertices[vertex_order[vi]].co for vi in face["indices"]]
+			center = sum(corners, Vector((0,0,0))) / len(corners)
+			normal = Vector((0,0,0))
+			for c in range(0, len(corners)):
+				a = corners[c]
+				b = corners[(c + 1) % len(corners)]
+				normal += (b - a).cross(center - a)
+			normal.normalize()
+			derived = f', "center":{format_vec3(center, 8)}, "normal":{format_vec3(normal, 8)}'
+		out.append(f'\t\t{{ "type":"{face["type"]}", "direction":{face["direction"]}, "indices":[{",".join(map(str, face["indices"]))}], "color":"{TYPE_COLORS[face["type"]]}"{derived} }}{comma}')
 		
 	out.append(f'\t],')
 	out.append(f'\t"yarns":[')
@@ -346,6 +380,13 @@ for obj in blocks.objects:
 		if yarn["end"] == None: pass
 		else: info += f' "end":{face_to_sorted[yarn["end"]]},'
 		info += f' "cps":[{",".join(cps)}],'
+		if PRECOMPUTE:
+			#tessellate the control points as written (i.e., rounded) so pts lie on the loaded curve:
+			rounded = [Vector((round(cp.x, 3), round(cp.y, 3), round(cp.z, 3))) for cp in yarn["cps"]]
+			pts = [rounded[0]]
+			for c in range(3, len(rounded), 3):
+				flatten_bezier(rounded[c-3], rounded[c-2], rounded[c-1], rounded[c], TOLERANCE, pts)
+			info += f' "pts":[{",".join(format_vec3(pt, 4) for pt in pts)}],'
 		info += f' "oriented": {"true" if yarn["oriented"] else "false"} }}{comma}'
 		out.append(info)
 		#was: out.append(f'\t\t{{ "begin":{yarn["begin"]}, "end":{yarn["end"]}, "cps":[{",".join(cps)}] }}{comma}')
@@ -359,7 +400,11 @@ for obj in blocks.objects:
 		if "human" in instructions[obj.name]:
 			human_instructions = instructions[obj.name]["human"]
 	out.append(f'\t"machine":{json.dumps(machine_instructions)},')
-	out.append(f'\t"human":{json.dumps(human_instructions)}')
+	if PRECOMPUTE:
+		out.append(f'\t"human":{json.dumps(human_instructions)},')
+		out.append(f'\t"validated":true')
+	else:
+		out.append(f'\t"human":{json.dumps(human_instructions)}')
 	out.append(f'}}')
 
 with open(outfile,'wb') as f:
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+#Note: Script meant to be executed with plain python3 (+ numpy), as per:
+#python3 export-yarn-path.py -- pattern.body blocks.json out.ply [tolerance:0.01] [lod:0] [tubes[:0.08]] [sides:6]
+
+import sys,os
+import json
+import math
+
+args = sys.argv[1:]
+if len(args) > 0 and args[0] == '--':
+	args = args[1:]
+
+if len(args) < 3 or len(args) > 7:
+	print("\n\nUsage:\npython3 export-yarn-path.py -- <pattern.body> <blocks.json> <out.(ply|obj)> [tolerance:0.01] [lod:0] [tubes[:radius]] [sides:6]\nEvaluates the yarns of every cell in a pattern, chains them across connected faces into continuous strands, and writes them as polylines (or, with 'tubes', swept tubes). Yarns are tessellated to within 'tolerance' (doubled per 'lod' level).\n")
+	exit(1)
+
+body_file = args[0]
+block_file = args[1]
+out_file = args[2]
+
+TOLERANCE = 0.01 #maximum distance between polyline and bezier curve (template units)
+LOD = 0 #each level doubles the tolerance
+TUBE_RADIUS = None #None means write polylines
+TUBE_SIDES = 6 #same defaults as VisTubes in index.html
+CHUNK_POINTS = 1 << 18 #points evaluated + written per batch (bounds memory use)
+
+for arg in args[3:]:
+	if arg.startswith("tolerance:"):
+		TOLERANCE = float(arg[len("tolerance:"):])
+	elif arg.startswith("lod:"):
+		LOD = int(arg[len("lod:"):])
+	elif arg == "tubes":
+		TUBE_RADIUS = 0.08
+	elif arg.startswith("tubes:"):
+		TUBE_RADIUS = float(arg[len("tubes:"):])
+	elif arg.startswith("sides:"):
+		TUBE_SIDES = int(arg[len("sides:"):])
+	else:
+		print(f"Unrecognized option '{arg}'")
+		exit(1)
+
+FORMAT = os.path.splitext(out_file)[1].lower()
+if FORMAT not in ['.ply', '.obj']:
+	print(f"Expecting output file '{out_file}' to end in .ply or .obj")
+	exit(1)
+
+import numpy
+
+def load_commented_json(filename):
+	with open(filename) as f:
+		strip_comment = lambda line : line if line.find("//") < 0 else (line[:line.find("//")] + "\n")
+		return json.loads("".join(strip_comment(line) for line in f))
+
+library = load_commented_json(block_file)
+body = load_commented_json(body_file)
+
+#same as Template.signature() in code/sv.mjs (name + face types); used as the template key in .body files:
+def signature(block_info):
+	return " ".join([block_info["name"]] + [face["type"] for face in block_info["faces"]])
+
+by_signature = { signature(block_info) : block_info for block_info in library }
+
+print(f"Reading '{body_file}' ({len(body)} cells) with library '{block_file}' ({len(library)} templates)")
+
+#---------------------------------------------
+#per-template yarn polylines (in template coordinates)
+
+tolerance = TOLERANCE * (2 ** LOD)
+
+#tessellate all cubic segments of a yarn at once; the number of uniform samples per segment is chosen
+#so that the chord error (<= |B''| / (8 n^2), with |B''| <= 6 max |second difference|) stays below tolerance:
+def tessellate(cps):
+	cps = numpy.array(cps, dtype=float)
+	segments = numpy.stack([cps[0:-1:3], cps[1::3], cps[2::3], cps[3::3]], axis=1) #(segments, 4, 3)
+	second = numpy.maximum(
+		numpy.linalg.norm(segments[:,0] - 2 * segments[:,1] + segments[:,2], axis=1),
+		numpy.linalg.norm(segments[:,1] - 2 * segments[:,2] + segments[:,3], axis=1)
+	)
+	steps = numpy.maximum(1, numpy.ceil(numpy.sqrt(0.75 * second / tolerance))).astype(int)
+	#evaluate every segment with the same step count in a single batch:
+	out = [None] * len(segments)
+	for count in numpy.unique(steps):
+		which = numpy.nonzero(steps == count)[0]
+		t = numpy.arange(1, count + 1) / count
+		basis = numpy.stack([(1-t)**3, 3*(1-t)**2*t, 3*(1-t)*t**2, t**3], axis=1) #(count, 4)
+		evaluated = numpy.einsum('tk,skd->std', basis, segments[which])
+		for i, s in enumerate(which):
+			out[s] = evaluated[i]
+	return numpy.concatenate([cps[0:1]] + out, axis=0)
+
+templates = dict() #signature -> info used by this pattern
+for cell in body:
+	sig = cell["template"]
+	if sig in templates: continue
+	if sig not in by_signature:
+		print(f"WARNING: template '{sig}' does not appear in the library -- skipping its cells")
+		templates[sig] = None
+		continue
+	block_info = by_signature[sig]
+	templates[sig] = {
+		"vertices":numpy.array(block_info["vertices"], dtype=float),
+		"yarns":block_info["yarns"],
+		"pts":[tessellate(yarn["cps"]) for yarn in block_info["yarns"]],
+	}
+
+#---------------------------------------------
+#cell rigid transforms, fit in batches per template (as per gm.rigidTransform in code/gm.mjs)
+
+cell_rot = numpy.zeros((len(body), 3, 3))
+cell_trans = numpy.zeros((len(body), 3))
+cell_ok = numpy.zeros(len(body), dtype=bool)
+
+for sig, info in templates.items():
+	if info is None: continue
+	which = numpy.array([c for c, cell in enumerate(body) if cell["template"] == sig])
+	A = info["vertices"]
+	B = numpy.array([body[c]["vertices"] for c in which], dtype=float) #(cells, vertices, 3)
+	A_mean = A.mean(axis=0)
+	B_mean = B.mean(axis=1)
+	S = numpy.einsum('cvi,vj->cij', B - B_mean[:,None,:], A - A_mean)
+	U, Sigma, Vt = numpy.linalg.svd(S)
+	flip = numpy.sign(numpy.linalg.det(U @ Vt))
+	flip[flip == 0] = 1
+	U[:,:,2] *= flip[:,None] #no reflections
+	rot = U @ Vt
+	cell_rot[which] = rot
+	cell_trans[which] = B_mean - numpy.einsum('cij,j->ci', rot, A_mean)
+	cell_ok[which] = True
+
+#---------------------------------------------
+#chain yarn pieces across connected faces
+
+#a yarn piece is (cell, yarn); its ends are (cell, yarn, 0) for cps[0] and (cell, yarn, 1) for cps[-1]
+def end_face(info, y, side):
+	return info["yarns"][y].get("begin" if side == 0 else "end")
+
+def end_position(c, y, side):
+	info = templates[body[c]["template"]]
+	pt = numpy.array(info["yarns"][y]["cps"][0 if side == 0 else -1], dtype=float)
+	return cell_rot[c] @ pt + cell_trans[c]
+
+#yarn ends touching each face of each cell:
+ends_at = dict()
+for c, cell in enumerate(body):
+	if not cell_ok[c]: continue
+	info = templates[cell["template"]]
+	for y in range(len(info["yarns"])):
+		for side in [0, 1]:
+			face = end_face(info, y, side)
+			if face is None: continue
+			ends_at.setdefault((c, face), []).append((c, y, side))
+
+#link ends across each connection, pairing the closest ends:
+links = dict()
+for (c, face), ends in ends_at.items():
+	connection = body[c]["connections"][face]
+	if connection is None: continue
+	other = (connection["cell"], connection["face"])
+	if other < (c, face) or other not in ends_at: continue #handle each connection once
+	remaining = list(ends_at[other])
+	for end in ends:
+		if len(remaining) == 0: break
+		at = end_position(*end)
+		best = min(range(len(remaining)), key=lambda i: numpy.linalg.norm(end_position(*remaining[i]) - at))
+		links[end] = remaining[best]
+		links[remaining[best]] = end
+		del remaining[best]
+
+#walk strands as lists of (cell, yarn, reversed), starting from open ends (preferring yarn beginnings) then cycles:
+visited = set()
+def walk(c, y, side):
+	strand = []
+	while (c, y) not in visited:
+		visited.add((c, y))
+		strand.append((c, y, side == 1))
+		exit_end = (c, y, 1 - side)
+		if exit_end not in links: break
+		c, y, side = links[exit_end]
+	return strand
+
+pieces = [(c, y) for c, cell in enumerate(body) if cell_ok[c] for y in range(len(templates[cell["template"]]["yarns"]))]
+strands = []
+for prefer in ['begin', 'open', 'any']:
+	for (c, y) in pieces:
+		if (c, y) in visited: continue
+		if prefer == 'begin' and (c, y, 0) in links: continue
+		if prefer == 'open' and (c, y, 0) in links and (c, y, 1) in links: continue
+		side = 1 if (prefer == 'open' and (c, y, 0) in links) else 0
+		strands.append(walk(c, y, side))
+
+def piece_points(c, y):
+	return len(templates[body[c]["template"]]["pts"][y])
+
+#each strand is its pieces' points, with the (shared) first point of every piece after the first dropped:
+strand_lengths = [1 + sum(piece_points(c, y) - 1 for (c, y, r) in strand) for strand in strands]
+total_points = sum(strand_lengths)
+
+print(f"  {len(pieces)} yarn pieces chained into {len(strands)} strands ({total_points} points at tolerance {tolerance})")
+
+#---------------------------------------------
+#streaming geometry
+
+#yields (strand index, points) runs in strand order, transforming pieces in batches of ~CHUNK_POINTS points:
+def point_runs():
+	batch = []
+	batch_points = 0
+	def flush():
+		#group the batch by (template, yarn) so each group is transformed in one einsum:
+		groups = dict()
+		for i, (s, c, y, r, first) in enumerate(batch):
+			groups.setdefault((body[c]["template"], y), []).append(i)
+		results = [None] * len(batch)
+		for (sig, y), members in groups.items():
+			local = templates[sig]["pts"][y]
+			cells = numpy.array([batch[i][1] for i in members])
+			world = numpy.einsum('cij,pj->cpi', cell_rot[cells], local) + cell_trans[cells][:,None,:]
+			for k, i in enumerate(members):
+				pts = world[k][::-1] if batch[i][3] else world[k]
+				results[i] = pts if batch[i][4] else pts[1:]
+		for i, (s, c, y, r, first) in enumerate(batch):
+			yield s, results[i]
+		batch.clear()
+	for s, strand in enumerate(strands):
+		for p, (c, y, r) in enumerate(strand):
+			batch.append((s, c, y, r, p == 0))
+			batch_points += piece_points(c, y)
+			if batch_points >= CHUNK_POINTS:
+				yield from flush()
+				batch_points = 0
+	yield from flush()
+
+#yields vertex arrays in output order; for tubes, TUBE_SIDES points per polyline point:
+def vertex_runs():
+	if TUBE_RADIUS is None:
+		for s, pts in point_runs():
+			yield pts
+		return
+	#tube rings need each point's neighbors, so hold back one run to see the next point of the strand:
+	angles = 2 * math.pi * numpy.arange(TUBE_SIDES) / TUBE_SIDES
+	def rings(before, pts, after, x_prev):
+		#central differences, one-sided at the ends of the strand:
+		padded = numpy.concatenate([before, pts, after], axis=0)
+		T = numpy.empty_like(padded)
+		T[1:-1] = padded[2:] - padded[:-2]
+		T[0] = padded[1] - padded[0]
+		T[-1] = padded[-1] - padded[-2]
+		T = T[len(before):len(before)+len(pts)]
+		T /= numpy.maximum(numpy.linalg.norm(T, axis=1), 1e-12)[:,None]
+		#parallel transport the frame along the strand (project the previous x onto each new normal plane),
+		# so ring vertex j stays next to vertex j of the next ring; the first ring of a strand starts from
+		# a fixed axis (z, or x when the tangent is mostly z):
+		x = numpy.empty_like(T)
+		for i, t in enumerate(T):
+			if x_prev is not None:
+				v = x_prev - numpy.dot(x_prev, t) * t
+				length = numpy.linalg.norm(v)
+			if x_prev is None or length < 1e-6:
+				v = numpy.array([0.0, 0.0, 1.0] if abs(t[2]) < 0.7 else [1.0, 0.0, 0.0])
+				v -= numpy.dot(v, t) * t
+				length = numpy.linalg.norm(v)
+			x[i] = x_prev = v / length
+		y = numpy.cross(T, x)
+		offsets = TUBE_RADIUS * (numpy.cos(angles)[None,:,None] * x[:,None,:] + numpy.sin(angles)[None,:,None] * y[:,None,:])
+		return (pts[:,None,:] + offsets).reshape(-1, 3), x_prev
+	empty = numpy.zeros((0, 3))
+	held = None #(strand, pts, before)
+	x_prev = None #frame x at the last ring emitted (carried across runs of the same strand)
+	for s, pts in point_runs():
+		if held is not None:
+			hs, hpts, hbefore = held
+			if hs == s:
+				verts, x_prev = rings(hbefore, hpts, pts[:1], x_prev)
+				yield verts
+				held = (s, pts, hpts[-1:])
+				continue
+			verts, x_prev = rings(hbefore, hpts, empty, x_prev)
+			yield verts
+		held = (s, pts, empty)
+		x_prev = None #new strand
+	if held is not None:
+		yield rings(held[2], held[1], empty, x_prev)[0]
+
+#yields connectivity (edges for polylines, quads for tubes) as arrays of 0-based vertex indices:
+def element_runs():
+	base = 0
+	for length in strand_lengths:
+		for start in range(0, length - 1, CHUNK_POINTS):
+			i = numpy.arange(start, min(start + CHUNK_POINTS, length - 1))
+			if TUBE_RADIUS is None:
+				yield numpy.stack([base + i, base + i + 1], axis=1)
+			else:
+				j = numpy.arange(TUBE_SIDES)
+				jn = (j + 1) % TUBE_SIDES
+				a = base + i[:,None] * TUBE_SIDES
+				b = base + (i[:,None] + 1) * TUBE_SIDES
+				yield numpy.stack([a + j, b + j, b + jn, a + jn], axis=2).reshape(-1, 4)
+		base += length * (1 if TUBE_RADIUS is None else TUBE_SIDES)
+
+total_vertices = total_points * (1 if TUBE_RADIUS is None else TUBE_SIDES)
+total_elements = sum(length - 1 for length in strand_lengths) * (1 if TUBE_RADIUS is None else TUBE_SIDES)
+
+with open(out_file, 'wb') as f:
+	if FORMAT == '.ply':
+		header = ['ply', 'format binary_little_endian 1.0', 'comment solid knitting yarn path from ' + os.path.basename(body_file)]
+		header += [f'element vertex {total_vertices}', 'property float x', 'property float y', 'property float z']
+		if TUBE_RADIUS is None:
+			header += [f'element edge {total_elements}', 'property int vertex1', 'property int vertex2']
+		else:
+			header += [f'element face {total_elements}', 'property list uchar int vertex_indices']
+		header += ['end_header']
+		f.write(('\n'.join(header) + '\n').encode('utf8'))
+		for verts in vertex_runs():
+			f.write(verts.astype('<f4').tobytes())
+		for elements in element_runs():
+			if TUBE_RADIUS is None:
+				f.write(elements.astype('<i4').tobytes())
+			else:
+				record = numpy.zeros(len(elements), dtype=[('n', 'u1'), ('v', '<i4', (4,))])
+				record['n'] = 4
+				record['v'] = elements
+				f.write(record.tobytes())
+	else:
+		f.write(f'# solid knitting yarn path from {os.path.basename(body_file)}\n'.encode('utf8'))
+		for verts in vertex_runs():
+			numpy.savetxt(f, verts, fmt='v %.6f %.6f %.6f')
+		for elements in element_runs():
+			numpy.savetxt(f, elements + 1, fmt=('l %d %d' if TUBE_RADIUS is None else 'f %d %d %d %d'))
+
+print(f"Wrote {total_vertices} vertices and {total_elements} {'edges' if TUBE_RADIUS is None else 'quads'} to '{out_file}'")
@@ -4,6 +4,10 @@
 
 #Note: Script meant to be executed from within blender, as per:
 #blender --python load-yarns.py -- <template.blend> <blocks.json> [--out out.png]
+#or, to lay out a whole pattern (one collection per template, instanced per cell):
+#blender --python load-yarns.py -- <template.blend> <blocks.json> body:<pattern.body> [save.blend] [animation-dir:dir]
+#or, to render library thumbnails packed into one sprite sheet (+ json index) for the UI:
+#blender --background --python load-yarns.py -- <template.blend> <blocks.json> atlas-dir:dir [thumbnail-size:128]
 
 import sys,re,os
 import json
@@ -13,18 +17,21 @@ for i in range(0,len(sys.argv)):
 	if sys.argv[i] == '--':
 		args = sys.argv[i+1:]
 
-if len(args) < 2 or len(args) > 5:
-	print("\n\nUsage:\nblender --python load-yarns.py -- <template.blend> <blocks.json> [save.blend] [animation-dir:dir] [camera-margin:1.0,1.0] [scale-radius:0.8]\nLoad the yarns into clones of the 'Yarn' bezier curve object in the template blend file. If smobj is specified, also creates edge/vertex/face geometry. \n")
+if len(args) < 2 or len(args) > 7:
+	print("\n\nUsage:\nblender --python load-yarns.py -- <template.blend> <blocks.json> [save.blend] [animation-dir:dir] [camera-margin:1.0,1.0] [scale-radius:0.8] [body:pattern.body] [atlas-dir:dir] [thumbnail-size:128]\nLoad the yarns into clones of the 'Yarn' bezier curve object in the template blend file. If smobj is specified, also creates edge/vertex/face geometry. If a body is specified, lays out the pattern instead of the library, instancing one collection per template. If an atlas dir is specified, renders (changed) library thumbnails and packs them into thumbnails.png + thumbnails.json.\n")
 	exit(1)
 
 CAMERA_MARGIN = (1.0, 1.0)
 SCALE_RADIUS = 1.0
+THUMBNAIL_SIZE = 128
 
 template_file = args[0]
 block_file = args[1]
 animation_dir = None
 smobj_file = None
 save_file = None
+body_file = None
+atlas_dir = None
 for arg in args[2:]:
 	if arg.endswith(".blend"):
 		assert(save_file == None)
@@ -38,24 +45,44 @@ for arg in args[2:]:
 		CAMERA_MARGIN = (float(x), float(y))
 	elif arg.startswith("scale-radius:"):
 		SCALE_RADIUS = float(arg[13:])
+	elif arg.startswith("body:"):
+		assert(body_file == None)
+		body_file = os.path.expanduser(arg[len("body:"):])
+	elif arg.startswith("atlas-dir:"):
+		assert(atlas_dir == None)
+		atlas_dir = os.path.expanduser(arg[len("atlas-dir:"):])
+	elif arg.startswith("thumbnail-size:"):
+		THUMBNAIL_SIZE = int(arg[len("thumbnail-size:"):])
 	else:
 		print("Expecting extra file '" + args[i] + "' to end in .png or .smobj")
 		exit(1)
+assert(not (atlas_dir and body_file)), "atlas-dir: renders the library, so it can't be combined with body:"
 
 print("Reading from '" + block_file + "' into template '" + template_file +"'")
+#library and body files are json with '//' comments (as in Body.fromArrayBuffer in code/sv.mjs):
+strip_comment = lambda line : line if line.find("//") < 0 else (line[:line.find("//")] + "\n")
+
 library = {}
 if block_file:
 	with open(block_file) as f:
-		strip_comment = lambda line : line if line.find("//") < 0 else (line[:line.find("//")] + "\n")
 		uncommented_lines = [strip_comment(line) for line in f]
 		uncommented_text = "".join(uncommented_lines)
 		print(uncommented_text)
 		library = json.loads(uncommented_text)
 
+body = None
+if body_file:
+	print("  + laying out pattern from '" + body_file + "'")
+	with open(body_file) as f:
+		body = json.loads("".join(strip_comment(line) for line in f))
+
 
 if animation_dir:
 	print("  + rendering to '" + animation_dir + "'")
 
+if atlas_dir:
+	print("  + rendering " + str(THUMBNAIL_SIZE) + "px thumbnail atlas to '" + atlas_dir + "'")
+
 print("  + camera margin " + str(CAMERA_MARGIN))
 
 import bpy, bmesh
@@ -215,7 +242,7 @@ def do_yarn(pts, radius, color_id = 0):
 box_min = (float('inf'), float('inf'), float('inf'))
 box_max = (float('-inf'), float('-inf'), float('-inf'))
 
-def do_block(block_info):
+def do_block(block_info, labels=True):
 	global box_min, box_max # allow fn to change box_min, box_max
 
 	vertices = block_info["vertices"]
@@ -293,7 +320,7 @@ def do_block(block_info):
 	bpy.ops.object.mode_set(mode='OBJECT')
 
 	# draw arrows and text on faces
-	for face in faces:
+	for face in (faces if labels else []):
 		if len(face["type"]) < 3:
 			# TODO: still draw letters on X faces
 			continue # no arrows for weird faces
@@ -354,98 +381,277 @@ def yarn_color(yarn, block_info):
 	else:
 		return 0
 
-yarn_objects = []
-block_objects = []
-
-dx = 8
-block_mins = []
-block_maxes = []
-for i, block_info in enumerate(library):
-	block_obj, bmin, bmax = do_block(block_info)
-	block_mins.append(bmin)
-	block_maxes.append(bmax)
-	for yarn in block_info["yarns"]:
-		pts = yarn["cps"]
-		radius = 0.1
-		color_id = yarn_color(yarn, block_info)
-		yarn_objects.append(
-			do_yarn(pts, radius, color_id)
-		)
-		yarn_objects[-1].parent = block_obj
-	block_obj.location[0] += i * dx
-	block_obj.location[2] = -bmin[2] + 0.01
-	block_objects.append(block_obj)
-
-#compute bounding box of all yarns:
-
-#apparently, evaluating depsgraph needed for bounding boxes to exist properly:
-dg = bpy.context.evaluated_depsgraph_get()
-
-
-# for obj in yarn_objects:
-# 	for bpt in obj.bound_box:
-# 		pt = obj.matrix_world @ Vector(bpt)
-# 		box_min = ( min(box_min[0], pt[0]), min(box_min[1], pt[1]), min(box_min[2], pt[2]) )
-# 		box_max = ( max(box_max[0], pt[0]), max(box_max[1], pt[1]), max(box_max[2], pt[2]) )
-
-print("Bounds: " + str(box_min) + " to " + str(box_max))
-
-
-#set background and camera based on bounding box:
-
-# BG_MARGIN = 5.0
-
-# #expand "Background" object (assuming 2x2 square centered at 0,0,0):
-# bg = bpy.data.objects['Background']
-# bg.location = (
-# 	0.5 * (box_min[0] + box_max[0]),
-# 	0.5 * (box_min[1] + box_max[1]),
-# 	box_min[2] - 0.1
-# )
-# #s = 0.5 * max(box_max[0] - box_min[0] + 2.0 * BG_MARGIN, box_max[1] - box_min[1] + 2.0 * BG_MARGIN)
-# #bg.scale = ( s, s, 1.0)
-# bg.scale = (
-# 	0.5 * (box_max[0] - box_min[0] + 2.0 * BG_MARGIN),
-# 	0.5 * (box_max[1] - box_min[1] + 2.0 * BG_MARGIN),
-# 	1.0
-# 	)
-
-camera = bpy.data.objects['Camera']
-camera_origin = camera.location.copy()
-camera.data.sensor_fit = 'VERTICAL'
-camera.data.ortho_scale = box_max[1] - box_min[1] + 2.0 * CAMERA_MARGIN[1]
-aspect = (box_max[0] - box_min[0] + 2.0 * CAMERA_MARGIN[0]) / (box_max[1] - box_min[1] + 2.0 * CAMERA_MARGIN[1])
-bpy.context.scene.render.resolution_x = math.ceil(bpy.context.scene.render.resolution_y * aspect)
-
-# animate blocks
-ground_plane.location[2] = 0
-for i, block_info in enumerate(library):
-	camera.location = camera_origin + Vector([
-		0.5 * (block_mins[i][0] + block_maxes[i][0]),
-		0.5 * (block_mins[i][1] + block_maxes[i][1]),
-		0.5 * (block_mins[i][2] + block_maxes[i][2]) - block_mins[i][2] + 0.01
+#same as Template.signature() in code/sv.mjs (name + face types); used as the template key in .body files:
+def signature(block_info):
+	return " ".join([block_info["name"]] + [face["type"] for face in block_info["faces"]])
+
+#rigid transform (4x4 matrix) best mapping points A onto points B, as per gm.rigidTransform in code/gm.mjs:
+def rigid_transform(A, B):
+	import numpy
+	A = numpy.array(A, dtype=float)
+	B = numpy.array(B, dtype=float)
+	A_mean = A.mean(axis=0)
+	B_mean = B.mean(axis=0)
+	S = (B - B_mean).T @ (A - A_mean)
+	U, Sigma, Vt = numpy.linalg.svd(S)
+	D = numpy.diag([1.0, 1.0, numpy.sign(numpy.linalg.det(U @ Vt)) or 1.0]) #no reflections
+	rot = U @ D @ Vt
+	translation = B_mean - rot @ A_mean
+	xform = Matrix.Identity(4)
+	for r in range(3):
+		for c in range(3):
+			xform[r][c] = rot[r][c]
+		xform[r][3] = translation[r]
+	return xform
+
+#same as Template.longsignature() in code/sv.mjs (longname + face types); used as the key of the thumbnail index:
+def longsignature(block_info):
+	return " ".join([block_info["longname"]] + [face["type"] for face in block_info["faces"]])
+
+#render each block (one per frame, as set up by the library layout) to a square thumbnail and pack them into a grid.
+# thumbnails are cached by a hash of the block + render settings, so only blocks that changed get re-rendered:
+def do_atlas(block_mins, block_maxes):
+	import hashlib
+	import numpy
+
+	cache_dir = os.path.join(atlas_dir, "thumbnails-cache")
+	os.makedirs(cache_dir, exist_ok=True)
+
+	scene = bpy.context.scene
+	render = scene.render
+	#every setting changed below, so a following animation render (animation-dir:) sees the scene's own settings:
+	restore = (render.resolution_x, render.resolution_y, render.resolution_percentage, render.film_transparent, render.filepath, render.image_settings.file_format, render.image_settings.color_mode, camera.data.ortho_scale)
+	scene.render.resolution_x = THUMBNAIL_SIZE
+	scene.render.resolution_y = THUMBNAIL_SIZE
+	scene.render.resolution_percentage = 100
+	scene.render.film_transparent = True
+	scene.render.image_settings.file_format = 'PNG'
+	scene.render.image_settings.color_mode = 'RGBA'
+
+	settings = json.dumps([THUMBNAIL_SIZE, CAMERA_MARGIN, SCALE_RADIUS, os.path.getmtime(template_file)])
+	thumbnails = []
+	rendered = 0
+	for i, block_info in enumerate(library):
+		key = hashlib.sha1((settings + json.dumps(block_info, sort_keys=True)).encode('utf8')).hexdigest()
+		path = os.path.join(cache_dir, key + ".png")
+		thumbnails.append(path)
+		if os.path.exists(path): continue
+		print(f"\t{i}:\t{block_info['longname']} -> {path}")
+		scene.frame_set(i+1) # 1-indexed frames
+		camera.data.ortho_scale = max(block_maxes[i][0] - block_mins[i][0], block_maxes[i][1] - block_mins[i][1]) + 2.0 * max(CAMERA_MARGIN)
+		scene.render.filepath = path
+		bpy.ops.render.render(write_still=True) # render still
+		rendered += 1
+	print(f"Rendered {rendered} of {len(library)} thumbnails.")
+	render.resolution_x, render.resolution_y, render.resolution_percentage, render.film_transparent, render.filepath, render.image_settings.file_format, render.image_settings.color_mode, camera.data.ortho_scale = restore
+
+	#drop thumbnails of blocks that no longer exist (or changed):
+	for name in os.listdir(cache_dir):
+		if os.path.join(cache_dir, name) not in thumbnails:
+			os.remove(os.path.join(cache_dir, name))
+
+	#pack into a grid, top-left first (blender images are stored bottom row first):
+	columns = max(1, math.ceil(math.sqrt(len(thumbnails))))
+	rows = max(1, math.ceil(len(thumbnails) / columns))
+	pixels = numpy.zeros((rows * THUMBNAIL_SIZE, columns * THUMBNAIL_SIZE, 4), dtype=numpy.float32)
+	index = dict()
+	for i, (path, block_info) in enumerate(zip(thumbnails, library)):
+		image = bpy.data.images.load(path)
+		tile = numpy.zeros(image.size[0] * image.size[1] * 4, dtype=numpy.float32)
+		image.pixels.foreach_get(tile)
+		tile = tile.reshape(image.size[1], image.size[0], 4)[:THUMBNAIL_SIZE,:THUMBNAIL_SIZE]
+		bpy.data.images.remove(image)
+		x = (i % columns) * THUMBNAIL_SIZE
+		y = (i // columns) * THUMBNAIL_SIZE
+		bottom = (rows * THUMBNAIL_SIZE) - y - THUMBNAIL_SIZE
+		pixels[bottom:bottom+tile.shape[0], x:x+tile.shape[1]] = tile
+		index[longsignature(block_info)] = {"x":x, "y":y, "w":THUMBNAIL_SIZE, "h":THUMBNAIL_SIZE}
+
+	atlas = bpy.data.images.new("Thumbnails", columns * THUMBNAIL_SIZE, rows * THUMBNAIL_SIZE, alpha=True)
+	atlas.pixels.foreach_set(pixels.ravel())
+	atlas.filepath_raw = os.path.join(atlas_dir, "thumbnails.png")
+	atlas.file_format = 'PNG'
+	atlas.save()
+
+	with open(os.path.join(atlas_dir, "thumbnails.json"), 'w') as f:
+		json.dump({"image":"thumbnails.png", "width":columns * THUMBNAIL_SIZE, "height":rows * THUMBNAIL_SIZE, "thumbnails":index}, f, indent='\t')
+	print(f"Wrote {len(index)} thumbnails to '{atlas.filepath_raw}'")
+
+if body is not None:
+	# build each template used by the pattern once, as a (non-rendered) collection:
+	by_signature = { signature(block_info) : block_info for block_info in library }
+	template_collections = dict()
+	for cell in body:
+		sig = cell["template"]
+		if sig in template_collections: continue
+		if sig not in by_signature:
+			print(f"WARNING: template '{sig}' does not appear in the library -- skipping its cells")
+			template_collections[sig] = None
+			continue
+		block_info = by_signature[sig]
+		collection = bpy.data.collections.new(sig)
+		block_obj, bmin, bmax = do_block(block_info, labels=False)
+		members = [block_obj]
+		for yarn in block_info["yarns"]:
+			yarn_obj = do_yarn(yarn["cps"], 0.1, yarn_color(yarn, block_info))
+			yarn_obj.parent = block_obj
+			members.append(yarn_obj)
+		#move from the scene into the template collection:
+		for obj in members:
+			collection.objects.link(obj)
+			for users in list(obj.users_collection):
+				if users != collection: users.objects.unlink(obj)
+		template_collections[sig] = collection
+
+	# each cell is an instance of its template's collection, placed by its rigid transform:
+	box_min = (float('inf'), float('inf'), float('inf'))
+	box_max = (float('-inf'), float('-inf'), float('-inf'))
+	instances = []
+	for i, cell in enumerate(body):
+		collection = template_collections[cell["template"]]
+		if collection is None: continue
+		for pt in cell["vertices"]:
+			box_min = ( min(box_min[0], pt[0]), min(box_min[1], pt[1]), min(box_min[2], pt[2]) )
+			box_max = ( max(box_max[0], pt[0]), max(box_max[1], pt[1]), max(box_max[2], pt[2]) )
+		instance = bpy.data.objects.new(f"Cell{i}", None)
+		instance.instance_type = 'COLLECTION'
+		instance.instance_collection = collection
+		instance.matrix_world = rigid_transform(by_signature[cell["template"]]["vertices"], cell["vertices"])
+		instances.append(instance)
+
+	# lift the whole pattern onto the ground plane:
+	pattern = bpy.data.objects.new("Pattern", None)
+	bpy.context.scene.collection.objects.link(pattern)
+	pattern.location[2] = -box_min[2] + 0.01
+	for instance in instances:
+		bpy.context.scene.collection.objects.link(instance)
+		instance.parent = pattern
+
+	print(f"Pattern: {len(instances)} cells instancing {len([c for c in template_collections.values() if c is not None])} templates")
+	print("Bounds: " + str(box_min) + " to " + str(box_max))
+
+	camera = bpy.data.objects['Camera']
+	camera.data.sensor_fit = 'VERTICAL'
+	camera.data.ortho_scale = box_max[1] - box_min[1] + 2.0 * CAMERA_MARGIN[1]
+	aspect = (box_max[0] - box_min[0] + 2.0 * CAMERA_MARGIN[0]) / (box_max[1] - box_min[1] + 2.0 * CAMERA_MARGIN[1])
+	bpy.context.scene.render.resolution_x = math.ceil(bpy.context.scene.render.resolution_y * aspect)
+	camera.location += Vector([
+		0.5 * (box_min[0] + box_max[0]),
+		0.5 * (box_min[1] + box_max[1]),
+		0.5 * (box_max[2] - box_min[2]) + 0.01
 	])
-	camera.keyframe_insert(data_path="location", frame=(i+1))
-	for obj in block_objects:
-		obj.keyframe_insert(data_path="location", frame=(i+1))
-		obj.location[0] -= dx
+	ground_plane.location[2] = 0
+	bpy.data.scenes["Scene"].frame_end = 1
 
-bpy.data.scenes["Scene"].frame_end = len(library)
+	if save_file:
+		bpy.ops.wm.save_as_mainfile(filepath=save_file)
 
-#template = bpy.data.objects['Yarn']
+	if animation_dir:
+		print("Rendering...")
+		bpy.context.scene.render.image_settings.file_format = 'PNG'
+		outpath = os.path.join(animation_dir, os.path.splitext(os.path.basename(body_file))[0])
+		print(f"\t{body_file} -> {outpath}")
+		bpy.context.scene.render.filepath = outpath
+		bpy.ops.render.render(write_still=True) # render still
+		print("...done!")
+		exit(0)
 
-if save_file:
-	bpy.ops.wm.save_as_mainfile(filepath=save_file)
+else:
+	yarn_objects = []
+	block_objects = []
 
-if animation_dir:
-	print("Rendering...")
-	bpy.context.scene.render.image_settings.file_format = 'PNG'
+	dx = 8
+	block_mins = []
+	block_maxes = []
 	for i, block_info in enumerate(library):
-		outpath = os.path.join(animation_dir, block_info["longname"])
-		print(f"\t{i}:\t{block_info['longname']} -> {outpath}")
-		bpy.context.scene.frame_set(i+1) # 1-indexed frames
-
-		bpy.context.scene.render.filepath = outpath
-		bpy.ops.render.render(write_still=True) # render still
-	print("...done!")
-	exit(0)
+		block_obj, bmin, bmax = do_block(block_info)
+		block_mins.append(bmin)
+		block_maxes.append(bmax)
+		for yarn in block_info["yarns"]:
+			pts = yarn["cps"]
+			radius = 0.1
+			color_id = yarn_color(yarn, block_info)
+			yarn_objects.append(
+				do_yarn(pts, radius, color_id)
+			)
+			yarn_objects[-1].parent = block_obj
+		block_obj.location[0] += i * dx
+		block_obj.location[2] = -bmin[2] + 0.01
+		block_objects.append(block_obj)
+
+	#compute bounding box of all yarns:
+
+	#apparently, evaluating depsgraph needed for bounding boxes to exist properly:
+	dg = bpy.context.evaluated_depsgraph_get()
+
+
+	# for obj in yarn_objects:
+	# 	for bpt in obj.bound_box:
+	# 		pt = obj.matrix_world @ Vector(bpt)
+	# 		box_min = ( min(box_min[0], pt[0]), min(box_min[1], pt[1]), min(box_min[2], pt[2]) )
+	# 		box_max = ( max(box_max[0], pt[0]), max(box_max[1], pt[1]), max(box_max[2], pt[2]) )
+
+	print("Bounds: " + str(box_min) + " to " + str(box_max))
+
+
+	#set background and camera based on bounding box:
+
+	# BG_MARGIN = 5.0
+
+	# #expand "Background" object (assuming 2x2 square centered at 0,0,0):
+	# bg = bpy.data.objects['Background']
+	# bg.location = (
+	# 	0.5 * (box_min[0] + box_max[0]),
+	# 	0.5 * (box_min[1] + box_max[1]),
+	# 	box_min[2] - 0.1
+	# )
+	# #s = 0.5 * max(box_max[0] - box_min[0] + 2.0 * BG_MARGIN, box_max[1] - box_min[1] + 2.0 * BG_MARGIN)
+	# #bg.scale = ( s, s, 1.0)
+	# bg.scale = (
+	# 	0.5 * (box_max[0] - box_min[0] + 2.0 * BG_MARGIN),
+	# 	0.5 * (box_max[1] - box_min[1] + 2.0 * BG_MARGIN),
+	# 	1.0
+	# 	)
+
+	camera = bpy.data.objects['Camera']
+	camera_origin = camera.location.copy()
+	camera.data.sensor_fit = 'VERTICAL'
+	camera.data.ortho_scale = box_max[1] - box_min[1] + 2.0 * CAMERA_MARGIN[1]
+	aspect = (box_max[0] - box_min[0] + 2.0 * CAMERA_MARGIN[0]) / (box_max[1] - box_min[1] + 2.0 * CAMERA_MARGIN[1])
+	bpy.context.scene.render.resolution_x = math.ceil(bpy.context.scene.render.resolution_y * aspect)
+
+	# animate blocks
+	ground_plane.location[2] = 0
+	for i, block_info in enumerate(library):
+		camera.location = camera_origin + Vector([
+			0.5 * (block_mins[i][0] + block_maxes[i][0]),
+			0.5 * (block_mins[i][1] + block_maxes[i][1]),
+			0.5 * (block_mins[i][2] + block_maxes[i][2]) - block_mins[i][2] + 0.01
+		])
+		camera.keyframe_insert(data_path="location", frame=(i+1))
+		for obj in block_objects:
+			obj.keyframe_insert(data_path="location", frame=(i+1))
+			obj.location[0] -= dx
+
+	bpy.data.scenes["Scene"].frame_end = len(library)
+
+	#template = bpy.data.objects['Yarn']
+
+	if save_file:
+		bpy.ops.wm.save_as_mainfile(filepath=save_file)
+
+	if atlas_dir:
+		do_atlas(block_mins, block_maxes)
+
+	if animation_dir:
+		print("Rendering...")
+		bpy.context.scene.render.image_settings.file_format = 'PNG'
+		for i, block_info in enumerate(library):
+			outpath = os.path.join(animation_dir, block_info["longname"])
+			print(f"\t{i}:\t{block_info['longname']} -> {outpath}")
+			bpy.context.scene.frame_set(i+1) # 1-indexed frames
+
+			bpy.context.scene.render.filepath = outpath
+			bpy.ops.render.render(write_still=True) # render still
+		print("...done!")
+		exit(0)
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+
+#Note: Script meant to be executed with plain python3, as per:
+#python3 simulate-knitout.py -- program.sk [costs:costs.json] [timeline:timeline.csv] [holder-capacity:2] [needle-capacity:2]
+
+#Simulates a solid knitout program (as saved by 'Save Knitout', i.e. exportSolidKnitout + groupPasses) line by line:
+# - tracks how many loops each needle ('f3', 'b3') and holder ('hf3,6', 'hb3,6') holds:
+#     tuck D H CS   adds a loop to holder H
+#     xfer A B      moves all loops from A to B
+#     roll A B      rolls the loops on holders A and B together onto B
+#     knit N H      knits off the loops on N and H, leaving N with the new loop and H with the loop to the next layer
+#     drop N        drops all loops from N
+#     release B     (releases yarn on bed B; no change in loops)
+#     pause ...     stops the machine for the operator
+# - groups instructions into carriage passes; a pass ends when the operation (or tuck direction) changes,
+#   when a needle/holder is used twice, or at a pause,
+# - counts racking changes and holder row changes between passes, where racking is the alignment a transfer needs:
+#     xfer between needle and holder: which bed the holder array faces (the needle's own side or across) and the x offset
+#     roll between holders: the front-to-back holder row offset (back holder rows are mirrored, 'hb' row y0+yMax-y)
+# - estimates machine time with a cost model.
+#Runs in one pass over the program with memory proportional to the number of needles/holders used.
+
+import sys
+import json
+import re
+
+args = sys.argv[1:]
+if len(args) > 0 and args[0] == '--':
+	args = args[1:]
+
+if len(args) < 1 or len(args) > 5:
+	print("\n\nUsage:\npython3 simulate-knitout.py -- <program.sk|-> [costs:costs.json] [timeline:timeline.csv|-] [holder-capacity:2] [needle-capacity:2]\nSimulates needle/holder occupancy of a solid knitout program, counts passes, racking changes, and pauses, and estimates machine time. Optionally reads cost model overrides from a json file and writes a per-pass timeline.\n")
+	exit(1)
+
+in_file = args[0]
+timeline_file = None
+HOLDER_CAPACITY = 2 #loops a holder can hold before it is reported as overfilled
+NEEDLE_CAPACITY = 2 #loops a needle can hold before it is reported as overfilled
+
+#cost model (seconds):
+COSTS = {
+	"pass":1.0, #fixed cost of each carriage pass
+	"needle":0.02, #per needle of carriage travel (span of the locations used in the pass)
+	"racking":0.5, #per racking change
+	"holder-row":1.0, #per change of the holder row presented to a bed
+	"pause":60.0, #per pause (operator intervention)
+}
+
+for arg in args[1:]:
+	if arg.startswith("costs:"):
+		with open(arg[len("costs:"):]) as f:
+			overrides = json.load(f)
+		for key, value in overrides.items():
+			if key not in COSTS:
+				print(f"Unknown cost '{key}' (expecting one of {', '.join(COSTS)})")
+				exit(1)
+			COSTS[key] = float(value)
+	elif arg.startswith("timeline:"):
+		timeline_file = arg[len("timeline:"):]
+	elif arg.startswith("holder-capacity:"):
+		HOLDER_CAPACITY = int(arg[len("holder-capacity:"):])
+	elif arg.startswith("needle-capacity:"):
+		NEEDLE_CAPACITY = int(arg[len("needle-capacity:"):])
+	else:
+		print(f"Unrecognized option '{arg}'")
+		exit(1)
+
+#locations as produced by allocateSpots (e.g. 'f3', 'b3', 'hf3,6', 'hb3,6'):
+NEEDLE = re.compile(r'^([fb])(-?\d+)$')
+HOLDER = re.compile(r'^h([fb])(-?\d+),(-?\d+)$')
+
+def parse_location(token, line_number):
+	match = NEEDLE.match(token)
+	if match: return ('n', match.group(1), int(match.group(2)), None)
+	match = HOLDER.match(token)
+	if match: return ('h', match.group(1), int(match.group(2)), int(match.group(3)))
+	raise ValueError(f"line {line_number}: expecting a needle or holder location, got '{token}'")
+
+def location_name(location):
+	kind, bed, x, y = location
+	return f"{bed}{x}" if kind == 'n' else f"h{bed}{x},{y}"
+
+loops = dict() #location -> number of loops held
+max_loops = dict() #'needle'/'holder' -> (count, location name, line number)
+warnings = dict() #kind -> [count, first few messages]
+
+def warn(kind, message):
+	entry = warnings.setdefault(kind, [0, []])
+	entry[0] += 1
+	if len(entry[1]) < 5: entry[1].append(message)
+
+def set_loops(location, count, line_number):
+	if count == 0:
+		loops.pop(location, None)
+	else:
+		loops[location] = count
+	kind = 'needle' if location[0] == 'n' else 'holder'
+	if count > max_loops.get(kind, (0,))[0]:
+		max_loops[kind] = (count, location_name(location), line_number)
+	capacity = NEEDLE_CAPACITY if kind == 'needle' else HOLDER_CAPACITY
+	if count > capacity:
+		warn(f"overfilled {kind}", f"line {line_number}: {location_name(location)} holds {count} loops")
+
+#------------------------------------------
+#passes
+
+totals = {"instructions":0, "passes":0, "racking":0, "holder-row":0, "pause":0}
+operations = dict() #operation -> count
+time = 0.0
+
+timeline = None
+if timeline_file == '-':
+	timeline = sys.stdout
+elif timeline_file:
+	timeline = open(timeline_file, 'w')
+if timeline:
+	timeline.write("pass,line,operation,direction,instructions,span,racking_changes,holder_row_changes,seconds,total_seconds\n")
+
+current = None #current pass
+racking = None #current alignment (see add_to_pass)
+holder_rows = dict() #bed -> holder row currently presented
+
+def end_pass():
+	global current, time
+	if current is None: return
+	span = (current["max_x"] - current["min_x"] + 1) if current["min_x"] is not None else 0
+	seconds = COSTS["pass"] + COSTS["needle"] * span + COSTS["racking"] * current["racking"] + COSTS["holder-row"] * current["holder-row"]
+	time += seconds
+	totals["passes"] += 1
+	if timeline:
+		timeline.write(f'{totals["passes"]},{current["line"]},{current["operation"]},{current["direction"] or ""},{current["instructions"]},{span},{current["racking"]},{current["holder-row"]},{seconds:.3f},{time:.3f}\n')
+	current = None
+
+def add_to_pass(operation, direction, locations, line_number):
+	global current, racking
+	names = [location_name(location) for location in locations]
+	if (current is None
+	 or current["operation"] != operation
+	 or current["direction"] != direction
+	 or any(name in current["used"] for name in names)):
+		end_pass()
+		current = {"line":line_number, "operation":operation, "direction":direction, "instructions":0, "used":set(), "min_x":None, "max_x":None, "racking":0, "holder-row":0}
+	current["instructions"] += 1
+	current["used"].update(names)
+	for kind, bed, x, y in locations:
+		current["min_x"] = x if current["min_x"] is None else min(current["min_x"], x)
+		current["max_x"] = x if current["max_x"] is None else max(current["max_x"], x)
+		if kind == 'h' and holder_rows.get(bed) != y:
+			if bed in holder_rows:
+				current["holder-row"] += 1
+				totals["holder-row"] += 1
+			holder_rows[bed] = y
+	#transfers need the beds/holder arrays racked to line up source and destination:
+	needles = [location for location in locations if location[0] == 'n']
+	holders = [location for location in locations if location[0] == 'h']
+	alignment = None
+	if operation == 'xfer' and len(needles) == 1 and len(holders) == 1:
+		#allocateSpots gives needles and their holders the same x, but the first transfer of a stitch goes
+		# across (e.g. 'xfer b3 hf3,5') while the next layer's loop comes back on the same side ('xfer hb3,3 b3'):
+		alignment = ('needle', needles[0][1] == holders[0][1], holders[0][2] - needles[0][2])
+	elif operation == 'roll' and len(holders) == 2:
+		front, back = sorted(holders, key=lambda location: location[1] != 'f')
+		alignment = ('holder', back[3] - front[3], back[2] - front[2])
+	if alignment is not None:
+		if racking is not None and alignment != racking:
+			current["racking"] += 1
+			totals["racking"] += 1
+		racking = alignment
+
+#------------------------------------------
+#simulation
+
+def simulate(line, line_number):
+	global time
+	comment = line.find(';')
+	if comment >= 0: line = line[:comment]
+	tokens = line.split()
+	if len(tokens) == 0: return
+	operation = tokens[0]
+	operations[operation] = operations.get(operation, 0) + 1
+	totals["instructions"] += 1
+
+	if operation == 'pause':
+		end_pass()
+		totals["pause"] += 1
+		time += COSTS["pause"]
+		if timeline:
+			timeline.write(f'{totals["passes"]},{line_number},pause,,1,0,0,0,{COSTS["pause"]:.3f},{time:.3f}\n')
+		return
+
+	if operation == 'tuck':
+		#tuck D H CS
+		if len(tokens) < 3: raise ValueError(f"line {line_number}: expecting 'tuck D H CS'")
+		holder = parse_location(tokens[2], line_number)
+		add_to_pass(operation, tokens[1], [holder], line_number)
+		set_loops(holder, loops.get(holder, 0) + 1, line_number)
+	elif operation in ['xfer', 'roll']:
+		#xfer A B / roll A B
+		if len(tokens) != 3: raise ValueError(f"line {line_number}: expecting '{operation} A B'")
+		src = parse_location(tokens[1], line_number)
+		dst = parse_location(tokens[2], line_number)
+		add_to_pass(operation, None, [src, dst], line_number)
+		count = loops.get(src, 0)
+		if count == 0 and (operation == 'xfer' or loops.get(dst, 0) == 0):
+			warn(f"{operation} from empty location", f"line {line_number}: {location_name(src)} is empty")
+		set_loops(src, 0, line_number)
+		set_loops(dst, loops.get(dst, 0) + count, line_number)
+	elif operation == 'knit':
+		#knit N H
+		if len(tokens) != 3: raise ValueError(f"line {line_number}: expecting 'knit N H'")
+		needle = parse_location(tokens[1], line_number)
+		holder = parse_location(tokens[2], line_number)
+		add_to_pass(operation, None, [needle, holder], line_number)
+		if loops.get(holder, 0) == 0:
+			warn("knit without yarn", f"line {line_number}: {location_name(holder)} is empty")
+		#in the knit.* sequences of instructions.json, H holds the loop tucked this row plus the old stitch moved
+		# there by 'xfer [Nx] [Hxy]'; knitting draws the new loop through, leaving the new stitch on N and exactly
+		# one loop on H, which the next layer picks up again with 'xfer [Hopxy] [Nx]':
+		set_loops(needle, 1, line_number)
+		set_loops(holder, 1, line_number)
+	elif operation == 'drop':
+		#drop N
+		if len(tokens) != 2: raise ValueError(f"line {line_number}: expecting 'drop N'")
+		needle = parse_location(tokens[1], line_number)
+		add_to_pass(operation, None, [needle], line_number)
+		set_loops(needle, 0, line_number)
+	elif operation == 'release':
+		#release B
+		add_to_pass(operation, None, [], line_number)
+	else:
+		warn("unknown operation", f"line {line_number}: '{operation}'")
+
+with (sys.stdin if in_file == '-' else open(in_file)) as f:
+	for line_number, line in enumerate(f, 1):
+		simulate(line, line_number)
+	end_pass()
+
+if timeline and timeline is not sys.stdout:
+	timeline.close()
+
+#------------------------------------------
+#report
+
+report = sys.stderr if timeline is sys.stdout else sys.stdout
+report.write(f"Simulated '{in_file}':\n")
+report.write(f"  {totals['instructions']} instructions ({', '.join(f'{count} {op}' for op, count in sorted(operations.items()))})\n")
+report.write(f"  {totals['passes']} carriage passes, {totals['racking']} racking changes, {totals['holder-row']} holder row changes, {totals['pause']} pauses\n")
+for kind in ['needle', 'holder']:
+	if kind in max_loops:
+		count, name, line_number = max_loops[kind]
+		report.write(f"  most loops on a {kind}: {count} ({name}, line {line_number})\n")
+report.write(f"  {len(loops)} locations still hold loops at the end\n")
+for kind, (count, examples) in sorted(warnings.items()):
+	report.write(f"  WARNING: {count} x {kind}\n")
+	for example in examples:
+		report.write(f"    {example}\n")
+minutes, seconds = divmod(time, 60)
+report.write(f"  estimated machine time: {time:.1f}s ({int(minutes)}m{seconds:04.1f}s) with costs {json.dumps(COSTS)}\n")
@@ -12,9 +12,26 @@ export class Geometry {
 		this.count = count;
 	}
 	draw(program, type = this.type, start = 0, count = this.count - start) {
+		this.bind(program);
+
+		//--- emit ---
+		this.gl.drawArrays(type, start, count);
+	}
+	//draw several ranges of the geometry with one binding; ranges is a flat array [start0, count0, start1, count1, ...]:
+	drawRanges(program, ranges, type = this.type) {
+		if (ranges.length === 0) return;
+		const gl = this.gl;
+
+		this.bind(program);
+
+		//--- emit ---
+		for (let i = 0; i < ranges.length; i += 2) {
+			gl.drawArrays(type, ranges[i], ranges[i+1]);
+		}
+	}
+	bind(program) {
 		const gl = this.gl;
 
-		//--- bind ---
 		for (const name in program.attribLocations) {
 			if (name in this.attribs) {
 				const attrib = this.attribs[name];
@@ -47,9 +64,6 @@ export class Geometry {
 				gl.vertexAttrib4f(program.attribLocations[name], 0.0, 0.0, 0.0, 1.0);
 			}
 		}
-
-		//--- emit ---
-		gl.drawArrays(type, start, count);
 	}
 
 }
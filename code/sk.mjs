@@ -116,6 +116,9 @@ export function noPassGrouping(fragmentList) {
 	return solidk;
 }
 
+// Text of previously-grouped passes, keyed by the first fragment of the pass (see groupPasses)
+const passCache = new WeakMap();
+
 // Take a list of program fragments and group them into passes before emitting the resulting code
 // Consecutive fragments with the same id have their instructions interleaved into unified passes
 // Fragments are in the form { "id": "fragName", "instructions": ["list", "of", "instructions"] }
@@ -123,6 +126,7 @@ export function noPassGrouping(fragmentList) {
 //    omits any releases that happen at the beginning of the program (artifacts from cast on row)
 //    omits empty fragments
 //    merges fragments from drops followed immediately by knits
+// Fragments are treated as immutable: passes made of the same fragment objects as a previous call reuse that call's text
 export function groupPasses(fragmentList) {
 	// console.log(fragmentList)
 
@@ -168,59 +172,70 @@ export function groupPasses(fragmentList) {
 			lookahead++;
 		}
 
-		console.log(currID, atProgramStart, passFragments);
+		// reuse this pass's text if it is made of exactly the same fragments as last time:
+		const consumed = fragmentList.slice(iF, iF + lookahead);
+		const cached = passCache.get(fragmentList[iF]);
+		if (cached && cached.fragments.length === consumed.length && cached.fragments.every((fragment, i) => fragment === consumed[i])) {
+			solidk += cached.text;
+		} else {
+			console.log(currID, atProgramStart, passFragments);
+
+			let text = "";
+
+			// interleave fragments
+			if (subsequentKnitFragments.length > 0) {
+				// special case for interleaved drops + knits
+				if (subsequentKnitFragments[0].length == 4) {
+					for (let iI = 0; iI < 2; ++iI) {
+						for (let iF = 0; iF < subsequentKnitFragments.length; ++iF) {
+							text += subsequentKnitFragments[iF][iI] + "\n";
+						}
+						text += "\n";
+					}
+					for (let iI = 0; iI < passFragments[0].length; ++iI) {
+						for (let iF = 0; iF < passFragments.length; ++iF) {
+							// dedupe pause messages
+							if (iF > 0 && passFragments[iF][iI].startsWith("pause") && passFragments[iF][iI] === passFragments[0][iI]) continue;
+
+							text += passFragments[iF][iI] + "\n";
+						}
+						text += "\n";
+					}
+					for (let iI = 2; iI < 4; ++iI) {
+						for (let iF = 0; iF < subsequentKnitFragments.length; ++iF) {
+							text += subsequentKnitFragments[iF][iI] + "\n";
+						}
+						text += "\n";
+					}
 
-		// interleave fragments
-		if (subsequentKnitFragments.length > 0) {
-			// special case for interleaved drops + knits
-			if (subsequentKnitFragments[0].length == 4) {
-				for (let iI = 0; iI < 2; ++iI) {
-					for (let iF = 0; iF < subsequentKnitFragments.length; ++iF) {
-						solidk += subsequentKnitFragments[iF][iI] + "\n";
+				} else { // if knits don't have four instructions, just leave in current order for now
+					console.error("Subsequent knit fabric does not have 4 instructions, so drop interleaving is undefined. Passes will be left in the given order");
+					for (let iI = 0; iI < passFragments[0].length; ++iI) {
+						for (let iF = 0; iF < passFragments.length; ++iF) {
+							text += passFragments[iF][iI] + "\n";
+						}
+						text += "\n";
+					}
+					for (let iI = 0; iI < subsequentKnitFragments[0].length; ++iI) {
+						for (let iF = 0; iF < subsequentKnitFragments.length; ++iF) {
+							text += subsequentKnitFragments[iF][iI] + "\n";
+						}
+						text += "\n";
 					}
-					solidk += "\n";
 				}
+			} else {	
 				for (let iI = 0; iI < passFragments[0].length; ++iI) {
 					for (let iF = 0; iF < passFragments.length; ++iF) {
 						// dedupe pause messages
 						if (iF > 0 && passFragments[iF][iI].startsWith("pause") && passFragments[iF][iI] === passFragments[0][iI]) continue;
 
-						solidk += passFragments[iF][iI] + "\n";
-					}
-					solidk += "\n";
-				}
-				for (let iI = 2; iI < 4; ++iI) {
-					for (let iF = 0; iF < subsequentKnitFragments.length; ++iF) {
-						solidk += subsequentKnitFragments[iF][iI] + "\n";
-					}
-					solidk += "\n";
-				}
-
-			} else { // if knits don't have four instructions, just leave in current order for now
-				console.error("Subsequent knit fabric does not have 4 instructions, so drop interleaving is undefined. Passes will be left in the given order");
-				for (let iI = 0; iI < passFragments[0].length; ++iI) {
-					for (let iF = 0; iF < passFragments.length; ++iF) {
-						solidk += passFragments[iF][iI] + "\n";
+						text += passFragments[iF][iI] + "\n";
 					}
-					solidk += "\n";
-				}
-				for (let iI = 0; iI < subsequentKnitFragments[0].length; ++iI) {
-					for (let iF = 0; iF < subsequentKnitFragments.length; ++iF) {
-						solidk += subsequentKnitFragments[iF][iI] + "\n";
-					}
-					solidk += "\n";
-				}
-			}
-		} else {	
-			for (let iI = 0; iI < passFragments[0].length; ++iI) {
-				for (let iF = 0; iF < passFragments.length; ++iF) {
-					// dedupe pause messages
-					if (iF > 0 && passFragments[iF][iI].startsWith("pause") && passFragments[iF][iI] === passFragments[0][iI]) continue;
-
-					solidk += passFragments[iF][iI] + "\n";
+					text += "\n";
 				}
-				solidk += "\n";
 			}
+			passCache.set(fragmentList[iF], {fragments: consumed, text: text});
+			solidk += text;
 		}
 		iF += lookahead;
 		if ( ! (currID.startsWith("pause")
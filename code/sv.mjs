@@ -323,7 +323,8 @@ export class Template {
 		faces = [],
 		yarns = [],
 		machine = {},
-		human = {}
+		human = {},
+		validated = false
 	} = {}) {
 		this.name = name;
 		this.longname = longname;
@@ -334,7 +335,8 @@ export class Template {
 		for (let i = 0; i < vertices.length; ++i) {
 			this.vertices.push(toVec3(`Template.vertices[${i}]`, vertices[i]));
 		}
-		for (let i = 1; i < this.vertices.length; ++i) {
+		//'validated' templates come from export-blocks.py, which already sorts vertices and faces:
+		for (let i = 1; !validated && i < this.vertices.length; ++i) {
 			const a = this.vertices[i-1];
 			const b = this.vertices[i];
 			if (a[0] < b[0]
@@ -363,7 +365,7 @@ export class Template {
 			if (!isVertexArray(faces[i].indices)) throw new Error(`Template.faces[${i}].indices (${faces[i].indices}) should be an array of vertex indices.`);
 			if (typeof faces[i].color !== 'string') throw new Error(`Template.faces[${i}].color should be a string.`);
 		}
-		for (let i = 1; i < faces.length; ++i) {
+		for (let i = 1; !validated && i < faces.length; ++i) {
 			const a = faces[i-1];
 			const b = faces[i];
 			const length = Math.max(a.length, b.length);
@@ -386,22 +388,17 @@ export class Template {
 		}
 		this.faces = faces;
 
-		//compute a normal direction + a center point for the faces (used when making yarn weights):
-		for (const face of this.faces) {
-			let center = gm.vec3(0);
-			for (let i = 0; i < face.indices.length; ++i) {
-				center = gm.add(center, this.vertices[face.indices[i]]);
-			}
-			center = gm.scale(1 / face.indices.length, center);
-			face.center = center;
-			let normal = gm.vec3(0);
-			for (let i = 0; i < face.indices.length; ++i) {
-				const a = this.vertices[face.indices[i]];
-				const b = this.vertices[face.indices[(i+1)%face.indices.length]];
-				normal = gm.add(normal, gm.cross(gm.sub(b,a), gm.sub(center,a)));
+		//a normal direction + a center point for the faces (used when making yarn weights);
+		// precomputed values (from export-blocks.py) are used as-is, otherwise computed on first use:
+		for (let i = 0; i < this.faces.length; ++i) {
+			const face = this.faces[i];
+			if ('center' in face && 'normal' in face) {
+				face.center = toVec3(`Template.faces[${i}].center`, face.center);
+				face.normal = toVec3(`Template.faces[${i}].normal`, face.normal);
+			} else {
+				defineLazy(face, 'center', () => computeFaceCenter(this, face));
+				defineLazy(face, 'normal', () => computeFaceNormal(this, face));
 			}
-			normal = gm.normalize(normal);
-			face.normal = normal;
 		}
 
 		//yarns:
@@ -441,7 +438,37 @@ export class Template {
 	}
 }
 
+function computeFaceCenter(template, face) {
+	let center = gm.vec3(0);
+	for (let i = 0; i < face.indices.length; ++i) {
+		center = gm.add(center, template.vertices[face.indices[i]]);
+	}
+	return gm.scale(1 / face.indices.length, center);
+}
+
+function computeFaceNormal(template, face) {
+	const center = face.center;
+	let normal = gm.vec3(0);
+	for (let i = 0; i < face.indices.length; ++i) {
+		const a = template.vertices[face.indices[i]];
+		const b = template.vertices[face.indices[(i+1)%face.indices.length]];
+		normal = gm.add(normal, gm.cross(gm.sub(b,a), gm.sub(center,a)));
+	}
+	return gm.normalize(normal);
+}
+
 function initYarn(template,yarn) {
+	//precomputed (adaptively tessellated) polyline from export-blocks.py:
+	if ('pts' in yarn) {
+		if (!Array.isArray(yarn.pts) || yarn.pts.length < 2) throw new Error(`yarn.pts should be an array of at least two points.`);
+		yarn.pts = yarn.pts.map((pt, i) => toVec3(`pts[${i}]`, pt));
+		return;
+	}
+	//otherwise, tessellate the control points when the polyline is first needed:
+	defineLazy(yarn, 'pts', () => tessellateYarn(yarn));
+}
+
+function tessellateYarn(yarn) {
 	let pts = [];
 	function splineTo(p1,p2,p3) {
 		const p0 = pts[pts.length-1];
@@ -461,7 +488,21 @@ function initYarn(template,yarn) {
 	for (let i = 3; i < yarn.cps.length; i += 3) {
 		splineTo(toVec3(`cps[${i-2}]`, yarn.cps[i-2]), toVec3(`cps[${i-1}]`, yarn.cps[i-1]), toVec3(`cps[${i}]`, yarn.cps[i]));
 	}
-	yarn.pts = pts;
+	return pts;
+}
+
+//define obj[key] as compute() on first read (after which it behaves as a plain data property):
+function defineLazy(obj, key, compute) {
+	function settle(value) {
+		Object.defineProperty(obj, key, {value, writable:true, enumerable:true, configurable:true});
+		return value;
+	}
+	Object.defineProperty(obj, key, {
+		get() { return settle(compute()); },
+		set(value) { settle(value); },
+		enumerable:true,
+		configurable:true
+	});
 }
 
 function toVec3(what, val) {